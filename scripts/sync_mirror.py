@@ -14,13 +14,63 @@ since the code is already in the mirror via branch sync.
 """
 
 import argparse
+import hashlib
+import http.client
 import json
+import os
 import re
+import select
 import subprocess
 import sys
+import threading
 import time
+import urllib.parse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Set
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    # Optional: decodes large PR list responses several times faster
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+
+# Number of PRs processed concurrently
+MAX_WORKERS = 8
+
+# GitHub API requests allowed per RATE_LIMIT_PERIOD seconds (GitHub secondary rate limits)
+RATE_LIMIT_BURST = 8
+RATE_LIMIT_PERIOD = 1.0
+
+# Content-creating requests (PR creation, mutations) allowed per period, on top of the
+# limit above; GitHub allows at most 80 of these per minute
+MUTATION_RATE_LIMIT_BURST = 1
+MUTATION_RATE_LIMIT_PERIOD = 1.0
+
+# Longest wait (seconds) for a rate limit to reset before giving up on a request
+RATE_LIMIT_MAX_WAIT = 300
+
+GITHUB_API_HOST = "api.github.com"
+
+# PR branches fetched and pushed per git call; PRs in a batch are processed while the next one is pushed
+BRANCH_BATCH_SIZE = 50
+
+# A repo's cached label map is refetched for a missing label at most this often (seconds)
+LABEL_REFRESH_INTERVAL = 60.0
+
+# Stale PRs closed per GraphQL request; each one costs two content-creating mutations
+CLOSE_BATCH_SIZE = 10
+
+# Newest open upstream PRs mirrored; older ones are left alone by both the full sync and the webhook
+UPSTREAM_PR_LIMIT = 500
+
+CLOSE_COMMENT = "Upstream PR was closed or merged. Code is synced via branch mirror."
+
+# Upstream PR state as of the last successful sync, used to skip unchanged PRs
+DEFAULT_STATE_FILE = os.path.expanduser("~/.cache/mirror-sync/state.json")
 
 
 @dataclass
@@ -29,16 +79,61 @@ class RepoConfig:
     upstream: str  # e.g., "facebook/react"
     mirror: str    # e.g., "greptileai/react-mirror"
     excluded_prs: Set[int] = field(default_factory=set)
+    state_file: str = DEFAULT_STATE_FILE
+    partial_fetch: bool = False
+
+
+class RateLimiter:
+    """Token bucket: each acquired token is returned by a timer after `period` seconds."""
+
+    def __init__(self, burst: int, period: float):
+        self._tokens = threading.Semaphore(burst)
+        self._period = period
+        self._paused_until = 0.0
+
+    def acquire(self) -> None:
+        self._tokens.acquire()
+        delay = self._paused_until - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        timer = threading.Timer(self._period, self._tokens.release)
+        timer.daemon = True
+        timer.start()
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every acquire for `seconds`, e.g. after GitHub asked us to retry later."""
+        self._paused_until = max(self._paused_until, time.time() + seconds)
+
+
+class GitHubError(Exception):
+    """A GitHub API request failed."""
+
+    def __init__(self, message: str, data: Optional[Dict] = None):
+        super().__init__(message)
+        # Data from a GraphQL response that only partially failed
+        self.data = data or {}
 
 
-def run_cmd(cmd: List[str], capture: bool = True, check: bool = True) -> Optional[str]:
+gh_rate_limiter = RateLimiter(RATE_LIMIT_BURST, RATE_LIMIT_PERIOD)
+gh_mutation_rate_limiter = RateLimiter(MUTATION_RATE_LIMIT_BURST, MUTATION_RATE_LIMIT_PERIOD)
+
+# One kept-alive HTTPS connection to the GitHub API per thread
+_connections = threading.local()
+
+# Label node IDs by name per repo, with the time they were fetched
+_label_ids: Dict[str, Tuple[float, Dict[str, str]]] = {}
+_label_ids_lock = threading.Lock()
+
+
+def run_cmd(cmd: List[str], capture: bool = True, check: bool = True, input: Optional[str] = None) -> Optional[str]:
     """Run a command and return stdout."""
     try:
         result = subprocess.run(
             cmd,
             capture_output=capture,
             text=True,
-            check=check
+            check=check,
+            input=input
         )
         return result.stdout.strip() if capture else None
     except subprocess.CalledProcessError as e:
@@ -50,77 +145,484 @@ def run_cmd(cmd: List[str], capture: bool = True, check: bool = True) -> Optiona
         return None
 
 
-def run_gh(args: List[str], check: bool = True) -> Optional[str]:
-    """Run a gh CLI command."""
-    return run_cmd(["gh"] + args, check=check)
+def run_git(args: List[str], check: bool = True, input: Optional[str] = None) -> Optional[str]:
+    """Run a git command."""
+    # No auto-gc: it would stall the sync halfway; maintain_repo runs it once at the end instead
+    return run_cmd(["git", "-c", "gc.auto=0"] + args, check=check, input=input)
+
+
+def delete_refs(refs: Iterable[str]) -> None:
+    """Delete local refs in one git call, ignoring ones that don't exist."""
+    commands = "".join(f"delete {ref}\n" for ref in refs)
+    if commands:
+        run_git(["update-ref", "--stdin"], check=False, input=commands)
+
+
+def maintain_repo() -> None:
+    """
+    Pack refs and let git gc when it thinks it is due. The webhook server
+    keeps one clone for its whole lifetime, so this has to run after every
+    sync, not just at the end of a scheduled run.
+    """
+    run_git(["pack-refs", "--all", "--prune"], check=False)
+    run_cmd(["git", "gc", "--auto", "--quiet"], check=False)
+
+
+@lru_cache(maxsize=None)
+def get_github_token() -> str:
+    """Get the GitHub token, falling back to the one gh is logged in with."""
+    return os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN") or run_cmd(["gh", "auth", "token"])
+
+
+def get_connection() -> http.client.HTTPSConnection:
+    """Get this thread's kept-alive connection to the GitHub API, reconnecting if the server closed it."""
+    connection = getattr(_connections, "connection", None)
+    # An idle kept-alive socket only becomes readable when the server closes it
+    if connection is not None and connection.sock is not None and select.select([connection.sock], [], [], 0)[0]:
+        connection.close()
+        connection = None
+    if connection is None:
+        connection = _connections.connection = http.client.HTTPSConnection(GITHUB_API_HOST, timeout=60)
+    return connection
+
+
+def send_request(method: str, path: str, payload: Optional[bytes], headers: Dict[str, str]) -> Tuple[http.client.HTTPResponse, bytes]:
+    """Send a request over this thread's connection. Returns the response and its body."""
+    for attempt in range(2):
+        connection = get_connection()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            return response, response.read()
+        except (http.client.HTTPException, OSError) as e:
+            # Never leave a half-used connection for this thread's next request
+            connection.close()
+            _connections.connection = None
+
+            # A POST may have reached GitHub even if it failed here (e.g. a timeout),
+            # so only GETs are resent, and only when the connection was dropped
+            dropped = isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+            if attempt or method != "GET" or not dropped:
+                raise
+
+
+def rate_limit_wait(response: http.client.HTTPResponse, data: bytes) -> Optional[float]:
+    """Seconds GitHub wants us to wait before retrying, or None if the response isn't rate limited."""
+    if response.status not in (403, 429):
+        return None
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        return float(retry_after)
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        return max(float(response.headers.get("X-RateLimit-Reset", 0)) - time.time(), 0) + 1
+    # Secondary rate limits don't always say how long to wait; GitHub asks for at least a minute
+    if response.status == 429 or b"secondary rate limit" in data:
+        return 60.0
+    return None
+
+
+def github_request(method: str, path: str, body: Optional[Dict] = None, etag: Optional[str] = None, mutating: Optional[bool] = None) -> Tuple[int, http.client.HTTPMessage, Optional[object]]:
+    """
+    Make a GitHub API request, conditional on `etag` if given.
+    `mutating` requests get the lower content-creation budget; by default every non-GET does.
+    Returns (status, headers, parsed body); the body is None for 204 and 304 responses.
+    """
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"bearer {get_github_token()}",
+        "User-Agent": "mirror-sync",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+    payload = None
+    if body is not None:
+        payload = json.dumps(body).encode()
+        headers["Content-Type"] = "application/json"
+    if etag:
+        headers["If-None-Match"] = etag
+
+    if mutating is None:
+        mutating = method != "GET"
+
+    for attempt in range(2):
+        if mutating:
+            gh_mutation_rate_limiter.acquire()
+        gh_rate_limiter.acquire()
+        response, data = send_request(method, path, payload, headers)
+
+        # A rate limited request was rejected outright, so it is safe to resend even a POST
+        wait = rate_limit_wait(response, data)
+        if wait is None or attempt or wait > RATE_LIMIT_MAX_WAIT:
+            break
+        print(f"  Rate limited on {method} {path}, retrying in {wait:.0f}s")
+        # Hold back the other workers too, they would only be rate limited as well
+        gh_rate_limiter.pause(wait)
+
+    if response.status >= 400:
+        raise GitHubError(f"{method} {path} failed ({response.status}): {data.decode(errors='replace')}")
+    if response.status in (204, 304):
+        return response.status, response.headers, None
+    return response.status, response.headers, json_loads(data)
+
+
+def run_graphql(query: str, variables: Optional[Dict] = None) -> Dict:
+    """Run a GraphQL request and return its data."""
+    mutating = query.lstrip().startswith("mutation")
+    _, _, result = github_request("POST", "/graphql", {"query": query, "variables": variables or {}}, mutating=mutating)
+    if result.get("errors"):
+        raise GitHubError("; ".join(error["message"] for error in result["errors"]), result.get("data"))
+    return result.get("data") or {}
+
+
+def run_mutations(mutations: List[Tuple[str, Dict]]) -> Dict:
+    """
+    Run several mutations in a single GraphQL request.
+    Each mutation is a (name, input) pair, e.g. ("updatePullRequest", {...}).
+    """
+    if not mutations:
+        return {}
+
+    params = []
+    fields = []
+    variables = {}
+    for i, (name, mutation_input) in enumerate(mutations):
+        params.append(f"$m{i}: {name[0].upper()}{name[1:]}Input!")
+        fields.append(f"m{i}: {name}(input: $m{i}) {{ clientMutationId }}")
+        variables[f"m{i}"] = mutation_input
+
+    query = f"mutation({', '.join(params)}) {{ {' '.join(fields)} }}"
+    return run_graphql(query, variables)
+
+
+def normalize_rest_pr(pr: Dict) -> Dict:
+    """Convert a REST API pull request to the shape of `gh pr list --json`."""
+    return {
+        "id": pr["node_id"],
+        "number": pr["number"],
+        "title": pr["title"],
+        "body": pr["body"] or "",
+        "isDraft": pr["draft"],
+        "baseRefName": pr["base"]["ref"],
+        "headRefName": pr["head"]["ref"],
+        "headRefOid": pr["head"]["sha"],
+        "author": {"login": (pr["user"] or {}).get("login", "ghost")},
+        "labels": [{"id": label["node_id"], "name": label["name"]} for label in pr["labels"]],
+    }
+
+
+def fetch_prs_conditional(repo: str, limit: int, cache_path: str) -> List[Dict]:
+    """
+    Get up to `limit` open PRs from a repo via the REST API, 100 per page.
+    Pages are cached with their ETag; a 304 reuses the cached page without
+    counting against the rate limit.
+    """
+    cached_pages = load_state(cache_path).get("pages", [])
+    pages = []
+    while len(pages) * 100 < limit:
+        cached = cached_pages[len(pages)] if len(pages) < len(cached_pages) else None
+        path = f"/repos/{repo}/pulls?state=open&per_page=100&page={len(pages) + 1}"
+        status, headers, data = github_request("GET", path, etag=cached["etag"] if cached else None)
+        prs = cached["prs"] if status == 304 else [normalize_rest_pr(pr) for pr in data]
+        pages.append({"etag": headers.get("ETag"), "prs": prs})
+        if len(prs) < 100:
+            break
+
+    unchanged = sum(1 for page, cached in zip(pages, cached_pages) if page["etag"] == cached["etag"])
+    print(f"  {unchanged}/{len(pages)} pages unchanged since last run")
+    save_state(cache_path, {"pages": pages})
+    return [pr for page in pages for pr in page["prs"]][:limit]
+
+
+PR_QUERY = """
+    query($owner: String!, $name: String!, $first: Int!, $cursor: String) {
+      repository(owner: $owner, name: $name) {
+        pullRequests(states: OPEN, first: $first, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}) {
+          nodes {
+            id number title body isDraft
+            baseRefName headRefName headRefOid
+            author { login }
+            labels(first: 50) { nodes { id name } }
+          }
+          pageInfo { hasNextPage endCursor }
+        }
+      }
+    }
+"""
+
+
+# Just enough of the same PRs as PR_QUERY to work out mirror branch names
+PR_HEADS_QUERY = """
+    query($owner: String!, $name: String!, $first: Int!, $cursor: String) {
+      repository(owner: $owner, name: $name) {
+        pullRequests(states: OPEN, first: $first, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}) {
+          nodes { number headRefName }
+          pageInfo { hasNextPage endCursor }
+        }
+      }
+    }
+"""
+
+
+def paginate_prs(repo: str, limit: int, query: str) -> List[Dict]:
+    """Get the PR nodes of a pullRequests query, 100 per GraphQL page, up to `limit`."""
+    owner, name = repo.split("/", 1)
+    prs = []
+    cursor = None
+    while len(prs) < limit:
+        data = run_graphql(query, {
+            "owner": owner,
+            "name": name,
+            "first": min(100, limit - len(prs)),
+            "cursor": cursor,
+        })
+        pull_requests = data["repository"]["pullRequests"]
+        prs.extend(pull_requests["nodes"])
+        if not pull_requests["pageInfo"]["hasNextPage"]:
+            break
+        cursor = pull_requests["pageInfo"]["endCursor"]
+    return prs
+
+
+def fetch_prs_graphql(repo: str, limit: int) -> List[Dict]:
+    """Get the newest `limit` open PRs from a repo."""
+    prs = paginate_prs(repo, limit, PR_QUERY)
+    for pr in prs:
+        # Match the shape of `gh pr list --json`
+        pr["author"] = pr["author"] or {"login": "ghost"}
+        pr["labels"] = pr["labels"]["nodes"]
+        pr["body"] = pr["body"] or ""
+    return prs
+
+
+def load_state(path: str) -> Dict:
+    """Load the sync state file, or an empty state if missing or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            return json_loads(f.read())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path: str, state: Dict) -> None:
+    """Atomically write the sync state file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def metadata_signature(title: str, body: str, labels: List[str], is_draft: bool) -> str:
+    """BLAKE2b-64 hex digest of a mirror PR's title, body, labels, and draft status."""
+    h = hashlib.blake2b(digest_size=8)
+    h.update(title.encode())
+    h.update(b"\0")
+    h.update(body.encode())
+    h.update(b"\0")
+    h.update(",".join(sorted(set(labels))).encode())
+    h.update(b"\0" + (b"1" if is_draft else b"0"))
+    return h.hexdigest()
+
+
+def pr_signature(config: RepoConfig, pr: Dict) -> List[str]:
+    """Head commit and metadata signature the mirror PR of an upstream PR should have."""
+    expected_body = build_pr_body(config, pr["number"], pr["author"]["login"], pr.get("body") or "")
+    return [pr["headRefOid"], metadata_signature(pr["title"], expected_body, get_label_names(pr), pr.get("isDraft", False))]
 
 
 def get_upstream_prs(config: RepoConfig) -> List[Dict]:
     """Get all open PRs from upstream repo."""
     print("Fetching open PRs from upstream...")
-    result = run_gh([
-        "pr", "list",
-        "--repo", config.upstream,
-        "--state", "open",
-        "--limit", "500",
-        "--json", "number,title,baseRefName,headRefName,headRefOid,body,author,labels,isDraft"
-    ])
-    return json.loads(result) if result else []
+    return fetch_prs_graphql(config.upstream, UPSTREAM_PR_LIMIT)
 
 
 def get_fork_prs(config: RepoConfig) -> Dict[str, Dict]:
     """Get all open PRs from fork, indexed by head branch."""
     print("Fetching open PRs from fork...")
-    result = run_gh([
-        "pr", "list",
-        "--repo", config.mirror,
-        "--state", "open",
-        "--limit", "1000",
-        "--json", "number,title,headRefName,headRefOid,body,labels,isDraft,id"
-    ])
-    prs = json.loads(result) if result else []
+    # Fork PRs only change when we sync them, so conditional requests usually hit the cache
+    cache_path = os.path.join(os.path.dirname(config.state_file), f"{config.mirror.replace('/', '__')}.fork_prs.json")
+    prs = fetch_prs_conditional(config.mirror, 1000, cache_path)
     return {pr["headRefName"]: pr for pr in prs}
 
 
-def get_branch_name(pr: Dict, all_prs: List[Dict]) -> str:
+def get_branch_name(pr: Dict, head_ref_counts: Counter) -> str:
     """Get the branch name for a PR, handling duplicates."""
     head_ref = pr["headRefName"]
-    # Count how many PRs have this same head ref name
-    count = sum(1 for p in all_prs if p["headRefName"] == head_ref)
-    if count > 1:
+    # Several PRs can share a head ref name (e.g. from different forks)
+    if head_ref_counts[head_ref] > 1:
         return f"{head_ref}-{pr['number']}"
     return head_ref
 
 
-def branch_exists_on_origin(branch: str) -> bool:
-    """Check if a branch exists on origin."""
-    result = run_cmd(
-        ["git", "ls-remote", "--heads", "origin", branch],
-        check=False
-    )
-    return bool(result and result.strip())
+def get_local_origin_branches() -> Set[str]:
+    """Get the branches origin had when last fetched, from local tracking refs (no network)."""
+    result = run_git(["for-each-ref", "--format=%(refname:strip=3)", "refs/remotes/origin/"], check=False)
+    return set((result or "").splitlines())
 
 
-def ensure_base_branch_exists(base_ref: str) -> bool:
-    """Ensure the base branch exists on origin, fetch from upstream if needed."""
-    if branch_exists_on_origin(base_ref):
-        return True
+def get_origin_branches() -> Set[str]:
+    """Get the names of all branches on origin with a single ls-remote."""
+    result = run_git(["ls-remote", "--heads", "origin"], check=False)
+    branches = set()
+    for line in (result or "").splitlines():
+        ref = line.split("\t", 1)[1]
+        branches.add(ref[len("refs/heads/"):])
+    return branches
+
+
+@lru_cache(maxsize=None)
+def configure_partial_fetch() -> None:
+    """Mark upstream as a promisor remote so blobs skipped by a filtered fetch are fetched lazily."""
+    run_git(["config", "remote.upstream.promisor", "true"])
+
+
+def clear_default_filter() -> None:
+    """
+    Drop the default filter git records for upstream on its first filtered fetch.
+    Left in place, it makes every later fetch from upstream blob-less, not just partial ones.
+    """
+    run_git(["config", "--unset", "remote.upstream.partialCloneFilter"], check=False)
+
+
+def git_fetch_many(refspecs: List[str], partial: bool = False) -> List[str]:
+    """
+    Fetch refspecs from upstream in one git fetch. Returns the refspecs that were fetched.
+    With `partial`, only commits and trees are fetched; git fetches the blobs a push needs on demand.
+    """
+    # Protocol v2 lets the server advertise only the requested refs instead of every refs/pull/*
+    fetch_args = ["-c", "protocol.version=2", "fetch", "upstream"]
+
+    if partial:
+        try:
+            configure_partial_fetch()
+            run_git(fetch_args + ["--filter=blob:none"] + refspecs)
+            return refspecs
+        except Exception:
+            print("  Partial fetch failed, falling back to a full fetch")
+        finally:
+            clear_default_filter()
+
+    # Fetch everything even if an older version left a default filter configured
+    fetch_args.append("--no-filter")
 
-    # Try to fetch from upstream
-    print(f"  Fetching missing base branch: {base_ref}")
     try:
-        run_cmd(["git", "fetch", "upstream", f"{base_ref}:{base_ref}"])
-        run_cmd(["git", "push", "origin", base_ref])
-        return True
-    except:
+        run_git(fetch_args + refspecs)
+        return refspecs
+    except Exception:
+        if len(refspecs) == 1:
+            return []
+
+    # A single missing ref fails the whole fetch, so retry one by one
+    fetched = []
+    for refspec in refspecs:
+        try:
+            run_git(fetch_args + [refspec])
+            fetched.append(refspec)
+        except Exception:
+            pass
+    return fetched
+
+
+def git_push_many(refspecs: List[str]) -> Set[str]:
+    """
+    Push refspecs to origin in one git push. Returns the names of the branches that were pushed.
+    Rejected refspecs are pushed again one by one, since a pre-receive hook
+    (e.g. push protection) rejects every ref in a push, not just the bad one.
+    """
+    if not refspecs:
+        return set()
+
+    try:
+        result = run_git(["push", "--porcelain", "origin"] + refspecs)
+    except subprocess.CalledProcessError as e:
+        # run_cmd printed git's stderr; the porcelain output still reports each ref
+        result = e.stdout or ""
+
+    # Porcelain lines look like "<flag>\t<src>:<dst>\t<summary>", flag "!" means rejected
+    refspecs_by_dst = {refspec.split(":", 1)[1]: refspec for refspec in refspecs}
+    pushed = set()
+    rejected = []
+    for line in result.splitlines():
+        parts = line.split("\t")
+        if len(parts) != 3:
+            continue
+        flag, refs, summary = parts
+        dst = refs.split(":", 1)[1]
+        if flag == "!":
+            rejected.append((refspecs_by_dst.get(dst, refs), dst, summary))
+        else:
+            pushed.add(dst[len("refs/heads/"):])
+
+    if len(refspecs) > 1:
+        for refspec, _, _ in rejected:
+            pushed |= git_push_many([refspec])
+    else:
+        for _, dst, summary in rejected:
+            print(f"  Failed to push branch {dst[len('refs/heads/'):]}: {summary}")
+    return pushed
+
+
+def ensure_base_branches_exist(base_refs: Set[str]) -> Set[str]:
+    """
+    Ensure base branches exist on origin, fetching missing ones from upstream.
+    Returns the base branches that are available on origin.
+    """
+    # Only ask origin about branches we have no local tracking ref for
+    missing = base_refs - get_local_origin_branches()
+    if missing:
+        missing -= get_origin_branches()
+    if not missing:
+        return set(base_refs)
+
+    # Fetch from upstream and push all missing base branches at once
+    refspecs = {}
+    for base_ref in sorted(missing):
+        print(f"  Fetching missing base branch: {base_ref}")
+        refspecs[f"refs/heads/{base_ref}:refs/mirror/heads/{base_ref}"] = base_ref
+    fetched = [refspecs[refspec] for refspec in git_fetch_many(list(refspecs))]
+    pushed = git_push_many([f"refs/mirror/heads/{base_ref}:refs/heads/{base_ref}" for base_ref in fetched])
+    delete_refs(f"refs/mirror/heads/{base_ref}" for base_ref in fetched)
+
+    for base_ref in sorted(missing - pushed):
         print(f"  WARNING: Could not fetch base branch {base_ref}")
-        return False
+    return (base_refs - missing) | pushed
+
+
+def needs_branch_update(pr: Dict, branch_name: str, fork_prs: Dict[str, Dict]) -> bool:
+    """Check if the mirror branch is missing or behind the upstream PR head."""
+    existing = fork_prs.get(branch_name)
+    return not existing or existing.get("headRefOid", "") != pr["headRefOid"]
+
+
+def sync_branches(branches: List[Tuple[int, str]], partial_fetch: bool = False) -> Set[str]:
+    """
+    Fetch upstream PR heads and force-push them to origin as (pr_num, branch_name)
+    pairs, using one git fetch and one git push for all of them. Refs the batch
+    can't handle (a closed PR, a branch rejected by push protection) are retried
+    one by one, so they only fail themselves.
+    Returns the names of the branches that were pushed.
+    """
+    if not branches:
+        return set()
+
+    print(f"\n=== Syncing {len(branches)} PR branches ===")
+
+    # Fetch into a private namespace to avoid conflict with checked-out branches
+    refspecs = {f"+pull/{pr_num}/head:refs/mirror/pull/{pr_num}": (pr_num, branch_name) for pr_num, branch_name in branches}
+    fetched = [refspecs[refspec] for refspec in git_fetch_many(list(refspecs), partial=partial_fetch)]
+    for pr_num, branch_name in sorted(set(branches) - set(fetched)):
+        print(f"  [{pr_num}] Failed to fetch branch: {branch_name}")
+
+    pushed = git_push_many([f"+refs/mirror/pull/{pr_num}:refs/heads/{branch_name}" for pr_num, branch_name in fetched])
+    # The fetched heads are only needed for the push; drop them so refs don't pile up
+    delete_refs(f"refs/mirror/pull/{pr_num}" for pr_num, _ in fetched)
+    return pushed
 
 
 def get_label_names(pr: Dict) -> List[str]:
-    """Extract label names from PR labels."""
-    labels = pr.get("labels", [])
-    return [label["name"] for label in labels]
+    """Extract label names from PR labels (computed once per PR and kept on the dict)."""
+    if "_label_names" not in pr:
+        pr["_label_names"] = [label["name"] for label in pr.get("labels", [])]
+    return pr["_label_names"]
 
 
 def escape_mentions(text: str) -> str:
@@ -142,87 +644,109 @@ def build_pr_body(config: RepoConfig, pr_num: int, author: str, body: str) -> st
 {escaped_body}"""
 
 
-def mark_pr_ready(config: RepoConfig, fork_pr_num: int) -> bool:
-    """Mark a draft PR as ready for review."""
-    try:
-        run_gh([
-            "pr", "ready", str(fork_pr_num),
-            "--repo", config.mirror
-        ])
-        return True
-    except:
-        return False
-
-
-def convert_pr_to_draft(pr_node_id: str) -> bool:
-    """Convert a ready PR back to draft using GraphQL."""
-    try:
-        run_gh([
-            "api", "graphql",
-            "-f", f"query=mutation {{ convertPullRequestToDraft(input: {{pullRequestId: \"{pr_node_id}\"}}) {{ pullRequest {{ isDraft }} }} }}"
-        ])
-        return True
-    except:
-        return False
-
+def fetch_label_ids(repo: str) -> Dict[str, str]:
+    """Fetch label node IDs for a repo, indexed by label name."""
+    owner, name = repo.split("/", 1)
+    query = """
+        query($owner: String!, $name: String!, $cursor: String) {
+          repository(owner: $owner, name: $name) {
+            labels(first: 100, after: $cursor) {
+              nodes { id name }
+              pageInfo { hasNextPage endCursor }
+            }
+          }
+        }
+    """
+    label_ids = {}
+    cursor = None
+    while True:
+        data = run_graphql(query, {"owner": owner, "name": name, "cursor": cursor})
+        labels = data["repository"]["labels"]
+        label_ids.update({label["name"]: label["id"] for label in labels["nodes"]})
+        if not labels["pageInfo"]["hasNextPage"]:
+            return label_ids
+        cursor = labels["pageInfo"]["endCursor"]
+
+
+def get_label_ids(repo: str, names: Iterable[str] = ()) -> Dict[str, str]:
+    """
+    Get label node IDs for a repo, indexed by label name.
+    The map is cached, and refetched if one of `names` is missing from it, since
+    labels can be created on the mirror while a long-running process is up.
+    """
+    with _label_ids_lock:
+        fetched_at, label_ids = _label_ids.get(repo, (0.0, None))
+        missing = label_ids is not None and any(name not in label_ids for name in names)
+        if label_ids is None or (missing and time.monotonic() - fetched_at > LABEL_REFRESH_INTERVAL):
+            label_ids = fetch_label_ids(repo)
+            _label_ids[repo] = (time.monotonic(), label_ids)
+        return label_ids
 
-def sync_labels(config: RepoConfig, fork_pr_num: int, upstream_labels: List[str], fork_labels: List[str]) -> None:
-    """Sync labels between upstream and fork PRs."""
-    upstream_set = set(upstream_labels)
-    fork_set = set(fork_labels)
 
-    # Labels to add
-    to_add = upstream_set - fork_set
+def label_mutations(config: RepoConfig, pr_node_id: str, upstream_labels: List[str], fork_labels: List[Dict]) -> List[Tuple[str, Dict]]:
+    """
+    Build the mutations that sync labels between upstream and fork PRs.
+    `fork_labels` are the fork PR's labels as returned by the API (with name and id).
+    """
+    fork_ids = {label["name"]: label["id"] for label in fork_labels}
+    to_add_names = sorted(set(upstream_labels) - fork_ids.keys())
+    mutations = []
+
+    # Labels to add (skip labels that don't exist on fork)
+    label_ids = get_label_ids(config.mirror, to_add_names)
+    to_add = [label_ids[name] for name in to_add_names if name in label_ids]
+    skipped = [name for name in to_add_names if name not in label_ids]
+    if skipped:
+        print(f"    Skipping labels missing on fork: {', '.join(skipped)}")
     if to_add:
-        run_gh([
-            "pr", "edit", str(fork_pr_num),
-            "--repo", config.mirror,
-            "--add-label", ",".join(to_add)
-        ], check=False)  # Don't fail if labels don't exist on fork
-
-    # Labels to remove
-    to_remove = fork_set - upstream_set
+        mutations.append(("addLabelsToLabelable", {"labelableId": pr_node_id, "labelIds": to_add}))
+
+    # Labels to remove (the fork PR already knows their IDs)
+    to_remove = [fork_ids[name] for name in sorted(fork_ids.keys() - set(upstream_labels))]
     if to_remove:
-        run_gh([
-            "pr", "edit", str(fork_pr_num),
-            "--repo", config.mirror,
-            "--remove-label", ",".join(to_remove)
-        ], check=False)
+        mutations.append(("removeLabelsFromLabelable", {"labelableId": pr_node_id, "labelIds": to_remove}))
 
+    return mutations
 
-def update_pr_metadata(config: RepoConfig, fork_pr_num: int, title: str, body: str, upstream_labels: List[str], fork_labels: List[str], is_draft: bool, fork_is_draft: bool, pr_node_id: str) -> bool:
-    """Update PR title, body, labels, and draft status."""
+
+def update_pr_metadata(config: RepoConfig, fork_pr_num: int, pr_node_id: str, diff: Dict) -> bool:
+    """
+    Update the PR fields that changed, in a single GraphQL request.
+    `diff` only has the keys that differ: "title" and "body" (new values),
+    "labels" ((upstream label names, fork label objects)) and "draft" (new draft status).
+    """
     try:
+        mutations = []
+
         # Update title and body
-        run_gh([
-            "pr", "edit", str(fork_pr_num),
-            "--repo", config.mirror,
-            "--title", title,
-            "--body", body
-        ])
+        if "title" in diff or "body" in diff:
+            fields = {key: diff[key] for key in ("title", "body") if key in diff}
+            mutations.append(("updatePullRequest", {"pullRequestId": pr_node_id, **fields}))
 
         # Sync labels (add new, remove old)
-        sync_labels(config, fork_pr_num, upstream_labels, fork_labels)
+        if "labels" in diff:
+            upstream_labels, fork_labels = diff["labels"]
+            mutations.extend(label_mutations(config, pr_node_id, upstream_labels, fork_labels))
 
-        # Update draft status if changed
-        if is_draft and not fork_is_draft:
-            # Convert to draft
+        # Update draft status
+        if diff.get("draft") is True:
             print(f"    Converting PR #{fork_pr_num} to draft")
-            convert_pr_to_draft(pr_node_id)
-        elif not is_draft and fork_is_draft:
-            # Mark as ready
+            mutations.append(("convertPullRequestToDraft", {"pullRequestId": pr_node_id}))
+        elif diff.get("draft") is False:
             print(f"    Marking PR #{fork_pr_num} as ready")
-            mark_pr_ready(config, fork_pr_num)
+            mutations.append(("markPullRequestReadyForReview", {"pullRequestId": pr_node_id}))
 
+        run_mutations(mutations)
         return True
     except Exception as e:
         print(f"  Failed to update PR metadata: {e}")
         return False
 
 
-def create_or_update_pr(config: RepoConfig, pr: Dict, branch_name: str, fork_prs: Dict[str, Dict]) -> str:
+def create_or_update_pr(config: RepoConfig, pr: Dict, branch_name: str, fork_prs: Dict[str, Dict], pushed_branches: Set[str]) -> str:
     """
     Create a new PR or update existing one.
+    `pushed_branches` are the branches sync_branches pushed this run.
     Returns: 'created', 'updated', 'unchanged', or 'failed'
     """
     pr_num = pr["number"]
@@ -252,77 +776,114 @@ def create_or_update_pr(config: RepoConfig, pr: Dict, branch_name: str, fork_prs
         # Check if branch update needed
         branch_updated = False
         if fork_sha != upstream_sha:
-            print(f"  [{pr_num}] Updating branch: {branch_name}")
-            try:
-                # Fetch to FETCH_HEAD first to avoid conflict with checked-out branches
-                run_cmd(["git", "fetch", "upstream", f"pull/{pr_num}/head"])
-                run_cmd(["git", "branch", "-f", branch_name, "FETCH_HEAD"])
-                run_cmd(["git", "push", "origin", branch_name, "--force"])
-                branch_updated = True
-            except Exception as e:
-                print(f"  [{pr_num}] Failed to update branch: {e}")
+            if branch_name not in pushed_branches:
+                print(f"  [{pr_num}] Failed to update branch: {branch_name}")
                 return "failed"
+            print(f"  [{pr_num}] Updated branch: {branch_name}")
+            branch_updated = True
 
         # Check if metadata update needed (title, body, labels, or draft status differ)
-        metadata_changed = (
-            fork_title != title or
-            fork_body != expected_body or
-            set(fork_labels) != set(upstream_labels) or
-            fork_is_draft != is_draft
-        )
+        diff = {}
+        upstream_signature = metadata_signature(title, expected_body, upstream_labels, is_draft)
+        fork_signature = metadata_signature(fork_title, fork_body, fork_labels, fork_is_draft)
+        if upstream_signature != fork_signature:
+            if fork_title != title:
+                diff["title"] = title
+            if fork_body != expected_body:
+                diff["body"] = expected_body
+            if set(fork_labels) != set(upstream_labels):
+                diff["labels"] = (upstream_labels, existing.get("labels", []))
+            if fork_is_draft != is_draft:
+                diff["draft"] = is_draft
+        metadata_changed = bool(diff)
 
         if metadata_changed:
-            print(f"  [{pr_num}] Updating metadata: {branch_name}")
-            update_pr_metadata(config, fork_pr_num, title, expected_body, upstream_labels, fork_labels, is_draft, fork_is_draft, fork_node_id)
+            print(f"  [{pr_num}] Updating metadata ({', '.join(diff)}): {branch_name}")
+            if not update_pr_metadata(config, fork_pr_num, fork_node_id, diff):
+                # Report failure so the PR stays out of the sync state and is retried
+                return "failed"
 
         if branch_updated or metadata_changed:
             return "updated"
         return "unchanged"
 
-    # New PR - ensure base branch exists
-    if not ensure_base_branch_exists(base):
-        print(f"  [{pr_num}] Skipping - base branch {base} not available")
+    # New PR - its branch was pushed by sync_branches if the base branch exists
+    if branch_name not in pushed_branches:
+        print(f"  [{pr_num}] Failed to create branch: {branch_name}")
         return "failed"
 
-    # Create new branch
     draft_label = " [DRAFT]" if is_draft else ""
     print(f"  [{pr_num}] Creating{draft_label}: {title[:50]}...")
-    try:
-        # Fetch to FETCH_HEAD first to avoid conflict with checked-out branches
-        run_cmd(["git", "fetch", "upstream", f"pull/{pr_num}/head"])
-        run_cmd(["git", "branch", "-f", branch_name, "FETCH_HEAD"])
-        run_cmd(["git", "push", "origin", branch_name, "--force"])
-    except Exception as e:
-        print(f"  [{pr_num}] Failed to create branch: {e}")
-        return "failed"
 
     # Create PR with labels and draft status
     try:
-        create_args = [
-            "pr", "create",
-            "--repo", config.mirror,
-            "--head", branch_name,
-            "--base", base,
-            "--title", title,
-            "--body", expected_body
-        ]
+        _, _, created = github_request("POST", f"/repos/{config.mirror}/pulls", {
+            "head": branch_name,
+            "base": base,
+            "title": title,
+            "body": expected_body,
+            "draft": is_draft,
+        })
 
         # Add labels if present
-        if upstream_labels:
-            create_args.extend(["--label", ",".join(upstream_labels)])
+        run_mutations(label_mutations(config, created["node_id"], upstream_labels, []))
 
-        # Create as draft if upstream is draft
-        if is_draft:
-            create_args.append("--draft")
-
-        result = run_gh(create_args)
-        print(f"  [{pr_num}] Created: {result}")
+        print(f"  [{pr_num}] Created: {created['html_url']}")
         return "created"
     except Exception as e:
         print(f"  [{pr_num}] Failed to create PR: {e}")
         return "failed"
 
 
+def plan_branch_pushes(prs: List[Tuple[Dict, str]], fork_prs: Dict[str, Dict]) -> List[Tuple[int, str]]:
+    """
+    Find which of the (pr, branch_name) pairs have a mirror branch that is
+    missing or behind upstream, and can be pushed. Returns (pr_num, branch_name) pairs.
+    """
+    candidates = [(pr, branch_name) for pr, branch_name in prs if needs_branch_update(pr, branch_name, fork_prs)]
+
+    # New PRs need their base branch on origin
+    new_pr_bases = {pr["baseRefName"] for pr, branch_name in candidates if branch_name not in fork_prs}
+    available_bases = ensure_base_branches_exist(new_pr_bases) if new_pr_bases else set()
+
+    branches_to_push = []
+    for pr, branch_name in candidates:
+        base = pr["baseRefName"]
+        if branch_name not in fork_prs and base not in available_bases:
+            print(f"  [{pr['number']}] Skipping - base branch {base} not available")
+            continue
+        branches_to_push.append((pr["number"], branch_name))
+
+    return branches_to_push
+
+
+def close_pr_batch(prs: List[Dict]) -> List[Dict]:
+    """Comment on and close fork PRs in a single GraphQL request. Returns the PRs that were closed."""
+    mutations = []
+    for pr in prs:
+        mutations.append(("addComment", {"subjectId": pr["id"], "body": CLOSE_COMMENT}))
+        mutations.append(("closePullRequest", {"pullRequestId": pr["id"]}))
+
+    try:
+        data = run_mutations(mutations)
+    except GitHubError as e:
+        # Some mutations may still have succeeded
+        print(f"  Failed to close some PRs: {e}")
+        data = e.data
+    except Exception as e:
+        print(f"  Failed to close PRs: {e}")
+        data = {}
+
+    # Each PR's closePullRequest is the odd-numbered alias
+    closed = []
+    for i, pr in enumerate(prs):
+        if data.get(f"m{2 * i + 1}"):
+            closed.append(pr)
+        else:
+            print(f"  Failed to close PR #{pr['number']}")
+    return closed
+
+
 def close_stale_prs(config: RepoConfig, upstream_branches: Set[str], fork_prs: Dict[str, Dict]) -> int:
     """
     Close PRs on fork that no longer exist on upstream.
@@ -333,35 +894,34 @@ def close_stale_prs(config: RepoConfig, upstream_branches: Set[str], fork_prs: D
     - PRs are for visibility only, not for code integration
     """
     print("\n=== Closing stale PRs ===")
-    closed = 0
 
-    for branch_name, pr in fork_prs.items():
-        if branch_name not in upstream_branches:
-            pr_num = pr["number"]
-            print(f"  Closing PR #{pr_num}: {branch_name}")
-            try:
-                run_gh([
-                    "pr", "close", str(pr_num),
-                    "--repo", config.mirror,
-                    "--delete-branch",
-                    "--comment", "Upstream PR was closed or merged. Code is synced via branch mirror."
-                ], check=False)
-                closed += 1
-            except:
-                print(f"  Failed to close PR #{pr_num}")
-
-            time.sleep(0.3)  # Rate limiting
+    stale = []
+    for branch_name in sorted(fork_prs.keys() - upstream_branches):
+        pr = fork_prs[branch_name]
+        print(f"  Closing PR #{pr['number']}: {branch_name}")
+        stale.append(pr)
 
-    return closed
+    # Close in batches, one request at a time: comments count against GitHub's content creation limit
+    closed_prs = []
+    for i in range(0, len(stale), CLOSE_BATCH_SIZE):
+        closed_prs.extend(close_pr_batch(stale[i:i + CLOSE_BATCH_SIZE]))
+
+    # Delete the closed PRs' branches with a single push
+    git_push_many([f":refs/heads/{pr['headRefName']}" for pr in closed_prs])
+
+    return len(closed_prs)
 
 
 def sync_prs(config: RepoConfig):
     """Sync all PRs from upstream to fork."""
     print("\n=== Syncing PRs ===")
 
-    # Get current state
-    upstream_prs = get_upstream_prs(config)
-    fork_prs = get_fork_prs(config)
+    # Get current state (both lists are fetched concurrently)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        upstream_future = executor.submit(get_upstream_prs, config)
+        fork_future = executor.submit(get_fork_prs, config)
+        upstream_prs = upstream_future.result()
+        fork_prs = fork_future.result()
 
     print(f"Found {len(upstream_prs)} open PRs on upstream")
     print(f"Found {len(fork_prs)} open PRs on fork")
@@ -375,10 +935,18 @@ def sync_prs(config: RepoConfig):
     unchanged = 0
     failed = 0
 
+    # Signatures of upstream PRs as of the last successful sync
+    state = load_state(config.state_file)
+    cached_signatures = state.get(config.upstream, {})
+    synced_signatures = {}
+
     # Sort PRs by number (oldest first) to maintain consistent ordering
     upstream_prs_sorted = sorted(upstream_prs, key=lambda x: x["number"])
 
-    # Process each upstream PR
+    # Number of upstream PRs sharing each head ref name
+    head_ref_counts = Counter(pr["headRefName"] for pr in upstream_prs)
+
+    changed = []
     for pr in upstream_prs_sorted:
         pr_num = pr["number"]
 
@@ -387,25 +955,69 @@ def sync_prs(config: RepoConfig):
             print(f"  [{pr_num}] Skipping (excluded)")
             continue
 
-        branch_name = get_branch_name(pr, upstream_prs)
+        branch_name = get_branch_name(pr, head_ref_counts)
         upstream_branches.add(branch_name)
 
-        result = create_or_update_pr(config, pr, branch_name, fork_prs)
-
-        if result == "created":
-            created += 1
-        elif result == "updated":
-            updated += 1
-        elif result == "unchanged":
+        # Nothing changed upstream since the mirror PR was last synced
+        signature = pr_signature(config, pr)
+        if signature == cached_signatures.get(str(pr_num)) and branch_name in fork_prs:
+            synced_signatures[str(pr_num)] = signature
             unchanged += 1
-        else:
-            failed += 1
+            continue
+
+        changed.append((pr, branch_name, signature))
+
+    branches_to_push = plan_branch_pushes([(pr, branch_name) for pr, branch_name, _ in changed], fork_prs)
+    waiting_for_push = {branch_name for _, branch_name in branches_to_push}
+
+    # Overlap the stages: PRs are processed concurrently (bound by GitHub API I/O)
+    # while the main thread pushes branches, then closes stale PRs
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {}
+        deferred = {}
+        for pr, branch_name, signature in changed:
+            if branch_name in waiting_for_push:
+                deferred[branch_name] = (pr, signature)
+            else:
+                # Metadata-only changes don't wait on any git work
+                futures[executor.submit(create_or_update_pr, config, pr, branch_name, fork_prs, set())] = (pr, signature)
+
+        # A batch's PRs start as soon as its branches are pushed
+        for i in range(0, len(branches_to_push), BRANCH_BATCH_SIZE):
+            batch = branches_to_push[i:i + BRANCH_BATCH_SIZE]
+            pushed_branches = sync_branches(batch, partial_fetch=config.partial_fetch)
+            for _, branch_name in batch:
+                pr, signature = deferred[branch_name]
+                futures[executor.submit(create_or_update_pr, config, pr, branch_name, fork_prs, pushed_branches)] = (pr, signature)
+
+        # Close stale PRs (code is already synced via branches)
+        closed = close_stale_prs(config, upstream_branches, fork_prs)
+
+        for future in as_completed(futures):
+            pr, signature = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"  [{pr['number']}] Failed: {e}")
+                result = "failed"
 
-        # Small delay to avoid rate limiting
-        time.sleep(0.3)
+            # Failed PRs are left out of the state so they are retried next run
+            if result != "failed":
+                synced_signatures[str(pr["number"])] = signature
 
-    # Close stale PRs (code is already synced via branches)
-    closed = close_stale_prs(config, upstream_branches, fork_prs)
+            if result == "created":
+                created += 1
+            elif result == "updated":
+                updated += 1
+            elif result == "unchanged":
+                unchanged += 1
+            else:
+                failed += 1
+
+    state[config.upstream] = synced_signatures
+    save_state(config.state_file, state)
+
+    maintain_repo()
 
     print(f"\n=== PR Sync Summary ===")
     print(f"Created: {created}")
@@ -417,11 +1029,56 @@ def sync_prs(config: RepoConfig):
     return failed == 0
 
 
-def parse_args() -> RepoConfig:
-    """Parse command line arguments and return config."""
-    parser = argparse.ArgumentParser(
-        description="Sync PRs from upstream repo to mirror repo"
-    )
+def get_upstream_pr_heads(config: RepoConfig) -> List[Dict]:
+    """Get the number and head ref of the open upstream PRs get_upstream_prs returns."""
+    return paginate_prs(config.upstream, UPSTREAM_PR_LIMIT, PR_HEADS_QUERY)
+
+
+def get_fork_pr(config: RepoConfig, branch_name: str) -> Optional[Dict]:
+    """Get the open fork PR for a mirror branch, if any."""
+    owner = config.mirror.split("/", 1)[0]
+    head = urllib.parse.quote(f"{owner}:{branch_name}", safe="")
+    _, _, prs = github_request("GET", f"/repos/{config.mirror}/pulls?state=open&head={head}")
+    return normalize_rest_pr(prs[0]) if prs else None
+
+
+def sync_single_pr(config: RepoConfig, pr: Dict, closed: bool = False) -> str:
+    """
+    Sync one upstream PR, e.g. in response to a webhook, without fetching every PR in full.
+    `pr` has the same shape as the PRs from get_upstream_prs.
+    Returns: 'created', 'updated', 'unchanged', 'closed', 'skipped', or 'failed'
+    """
+    pr_num = pr["number"]
+    if pr_num in config.excluded_prs:
+        print(f"  [{pr_num}] Skipping (excluded)")
+        return "skipped"
+
+    # Name the branch from the same PRs as the full sync, or the two would fight over it
+    upstream_prs = get_upstream_pr_heads(config)
+    # PR numbers grow with creation time, so PRs older than the full sync's window have lower numbers
+    if len(upstream_prs) >= UPSTREAM_PR_LIMIT and pr_num < min(p["number"] for p in upstream_prs):
+        print(f"  [{pr_num}] Skipping (older than the newest {UPSTREAM_PR_LIMIT} open PRs)")
+        return "skipped"
+    # A closed PR no longer shows up among the open PRs sharing its head ref
+    if all(p["number"] != pr_num for p in upstream_prs):
+        upstream_prs.append(pr)
+    branch_name = get_branch_name(pr, Counter(p["headRefName"] for p in upstream_prs))
+
+    fork_pr = get_fork_pr(config, branch_name)
+    fork_prs = {branch_name: fork_pr} if fork_pr else {}
+
+    if closed:
+        if not fork_prs:
+            return "unchanged"
+        return "closed" if close_stale_prs(config, set(), fork_prs) else "failed"
+
+    pushed_branches = sync_branches(plan_branch_pushes([(pr, branch_name)], fork_prs), partial_fetch=config.partial_fetch)
+    maintain_repo()
+    return create_or_update_pr(config, pr, branch_name, fork_prs, pushed_branches)
+
+
+def add_repo_args(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments that describe a repo sync pair."""
     parser.add_argument(
         "--upstream",
         required=True,
@@ -438,9 +1095,20 @@ def parse_args() -> RepoConfig:
         default="",
         help="Comma-separated list of PR numbers to skip (e.g., 123,456)"
     )
+    parser.add_argument(
+        "--state-file",
+        default=DEFAULT_STATE_FILE,
+        help=f"Where to keep upstream PR state between runs (default: {DEFAULT_STATE_FILE})"
+    )
+    parser.add_argument(
+        "--partial-fetch",
+        action="store_true",
+        help="Fetch PR heads without blobs (--filter=blob:none); blobs are fetched lazily when pushing"
+    )
 
-    args = parser.parse_args()
 
+def config_from_args(args: argparse.Namespace) -> RepoConfig:
+    """Build the repo config from arguments added by add_repo_args."""
     # Parse excluded PRs
     excluded = set()
     if args.excluded_prs:
@@ -449,8 +1117,19 @@ def parse_args() -> RepoConfig:
     return RepoConfig(
         upstream=args.upstream,
         mirror=args.mirror,
-        excluded_prs=excluded
+        excluded_prs=excluded,
+        state_file=args.state_file,
+        partial_fetch=args.partial_fetch
+    )
+
+
+def parse_args() -> RepoConfig:
+    """Parse command line arguments and return config."""
+    parser = argparse.ArgumentParser(
+        description="Sync PRs from upstream repo to mirror repo"
     )
+    add_repo_args(parser)
+    return config_from_args(parser.parse_args())
 
 
 def main():
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Webhook server for mirroring upstream PR changes as they happen.
+
+This server:
+1. Receives GitHub `pull_request` webhook events for the upstream repo
+2. Coalesces bursts of events for the same PR (e.g. several labels added at once)
+3. Syncs only the affected PR, using the same code path as sync_mirror.py
+
+Note: The scheduled full sync (sync_mirror.py) keeps running as a
+reconciliation pass for missed or failed deliveries. Like sync_mirror.py,
+the server must run inside a clone of the mirror repo with an `upstream`
+remote. The webhook secret is read from the WEBHOOK_SECRET env var.
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Hashable, Tuple
+
+from sync_mirror import RepoConfig, add_repo_args, config_from_args, normalize_rest_pr, sync_single_pr
+
+
+# pull_request actions that change something the mirror PR reflects
+SYNC_ACTIONS = {
+    "opened",
+    "reopened",
+    "synchronize",
+    "edited",
+    "labeled",
+    "unlabeled",
+    "closed",
+    "ready_for_review",
+    "converted_to_draft",
+}
+
+
+class Debouncer:
+    """Calls `callback(key, value)` once no new value was submitted for `key` for `delay` seconds."""
+
+    def __init__(self, delay: float, callback: Callable[[Hashable, object], None]):
+        self._delay = delay
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._timers: Dict[Hashable, threading.Timer] = {}
+
+    def submit(self, key: Hashable, value: object) -> None:
+        with self._lock:
+            pending = self._timers.get(key)
+            if pending:
+                pending.cancel()
+            timer = threading.Timer(self._delay, self._fire, args=(key, value))
+            timer.daemon = True
+            self._timers[key] = timer
+            timer.start()
+
+    def _fire(self, key: Hashable, value: object) -> None:
+        with self._lock:
+            # A newer submit replaced this timer after it had already started
+            if self._timers.get(key) is not threading.current_thread():
+                return
+            del self._timers[key]
+        self._callback(key, value)
+
+
+def verify_signature(secret: bytes, body: bytes, signature: str) -> bool:
+    """Check the X-Hub-Signature-256 header against the request body."""
+    expected = "sha256=" + hmac.new(secret, body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def make_handler(config: RepoConfig, secret: bytes, debouncer: Debouncer):
+    """Build the request handler class for a repo sync pair."""
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not verify_signature(secret, body, self.headers.get("X-Hub-Signature-256", "")):
+                self.send_response(401)
+                self.end_headers()
+                return
+
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                self.send_response(400)
+                self.end_headers()
+                return
+
+            event = self.headers.get("X-GitHub-Event")
+            repo = payload.get("repository", {}).get("full_name", "")
+            if event == "pull_request" and payload.get("action") in SYNC_ACTIONS and repo.lower() == config.upstream.lower():
+                pr = normalize_rest_pr(payload["pull_request"])
+                closed = payload["pull_request"]["state"] == "closed"
+                debouncer.submit(pr["number"], (pr, closed))
+                self.send_response(202)
+            else:
+                self.send_response(204)
+            self.end_headers()
+
+    return WebhookHandler
+
+
+def parse_args() -> Tuple[RepoConfig, argparse.Namespace]:
+    """Parse command line arguments and return config and server options."""
+    parser = argparse.ArgumentParser(
+        description="Sync upstream PRs to mirror repo on webhook events"
+    )
+    add_repo_args(parser)
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8080,
+        help="Port to listen on (default: 8080)"
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=3.0,
+        help="Seconds to wait for more events on a PR before syncing it (default: 3)"
+    )
+
+    args = parser.parse_args()
+    return config_from_args(args), args
+
+
+def main():
+    config, args = parse_args()
+
+    secret = os.environ.get("WEBHOOK_SECRET")
+    if not secret:
+        print("WEBHOOK_SECRET is not set")
+        sys.exit(1)
+
+    # Syncs share the git working copy, so run them one at a time
+    sync_lock = threading.Lock()
+
+    def sync(pr_num: int, event: Tuple[Dict, bool]) -> None:
+        pr, closed = event
+        with sync_lock:
+            try:
+                result = sync_single_pr(config, pr, closed=closed)
+                print(f"  [{pr_num}] {result}")
+            except Exception as e:
+                print(f"  [{pr_num}] Failed: {e}")
+
+    debouncer = Debouncer(args.debounce, sync)
+    server = ThreadingHTTPServer(("", args.port), make_handler(config, secret.encode(), debouncer))
+
+    print("=" * 60)
+    print(f"Mirror PR Webhook: {config.upstream} -> {config.mirror} (port {args.port})")
+    print("=" * 60)
+
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()